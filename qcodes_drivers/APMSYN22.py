@@ -4,8 +4,10 @@ from qcodes.instrument import VisaInstrument
 from qcodes import Function, Parameter
 from qcodes.validators import Numbers
 
+from .scpi_batch import ScpiBatchMixin
 
-class APMSYN22(VisaInstrument):
+
+class APMSYN22(ScpiBatchMixin, VisaInstrument):
     """
     QCodes driver for AnaPico APMSYN22 RF synthesizer. Based on N51x1 driver and AnaPico programming manual.
     For now only CW operation is supported and the output power is limited to a range that supports all frequencies.
@@ -14,7 +16,9 @@ class APMSYN22(VisaInstrument):
     def __init__(self, name: str, address: str, min_power: int = -20, max_power: int = 16, **kwargs: Any):
         super().__init__(name, address, terminator='\n', **kwargs)
 
-        self._options = self.ask("*OPT?")
+        self._options = frozenset(
+            option.strip() for option in self.ask("*OPT?").strip('"').split(",")
+        )
 
         self.power = Parameter(
             name="power",
@@ -85,8 +89,9 @@ class APMSYN22(VisaInstrument):
 
     def get_idn(self) -> Dict[str, Optional[str]]:
         IDN_str = self.ask_raw('*IDN?')
-        vendor, model, serial, firmware = map(str.strip, IDN_str.split(','))
+        # maxsplit=3 keeps any commas in the firmware field
+        vendor, model, serial, firmware = IDN_str.split(',', 3)
         IDN: Dict[str, Optional[str]] = {
-            'vendor': vendor, 'model': model,
-            'serial': serial, 'firmware': firmware}
+            'vendor': vendor.strip(), 'model': model.strip(),
+            'serial': serial.strip(), 'firmware': firmware.strip()}
         return IDN
@@ -1,13 +1,26 @@
-from typing import Any
+import time
+from typing import Any, Optional
 
 import numpy as np
+from pyvisa import constants
 from qcodes import Function, Parameter, VisaInstrument
 from qcodes.utils.validators import Arrays, Ints
 
+from .scpi_batch import ScpiBatchMixin, batch_get
+
+SERVICE_REQUEST = constants.EventType.service_request
+
+
+def parse_sweep_done(operation_condition: str) -> bool:
+    """Bit 3 of the operation condition register is set while sweeping."""
+    return not int(operation_condition) & 8
+
 
 class LinSpaceSetpoints(Parameter):
     """A parameter which generates an array of evenly spaced setpoints from start, stop,
     and points parameters.
+    The three parameters must have get_cmd strings and belong to the same instrument.
+    The array is reused (read-only) until one of them changes.
     """
 
     def __init__(
@@ -17,12 +30,22 @@ class LinSpaceSetpoints(Parameter):
         self._start = start
         self._stop = stop
         self._points = points
+        self._key = None
+        self._setpoints = None
 
     def get_raw(self):
-        return np.linspace(self._start(), self._stop(), self._points())
+        # one compound query instead of three round trips; also updates their caches
+        key = tuple(
+            batch_get(self.instrument, (self._start, self._stop, self._points))
+        )
+        if key != self._key:
+            self._setpoints = np.linspace(*key)
+            self._setpoints.flags.writeable = False
+            self._key = key
+        return self._setpoints
 
 
-class E82x7(VisaInstrument):
+class E82x7(ScpiBatchMixin, VisaInstrument):
     """
     Agilent/Keysight E82x7 Signal Generator
     """
@@ -32,6 +55,7 @@ class E82x7(VisaInstrument):
 
     def __init__(self, name: str, address: str, **kwargs: Any) -> None:
         super().__init__(name, address, terminator="\n", **kwargs)
+        self._service_request_enabled = False
 
         self.add_function(
             name="preset",
@@ -132,5 +156,33 @@ class E82x7(VisaInstrument):
             name="sweep_done",
             instrument=self,
             get_cmd="STAT:OPER:COND?",
-            get_parser=lambda x: int(x) & 8 == 0,
+            get_parser=parse_sweep_done,
         )
+
+    def wait_for_sweep(self, timeout: Optional[float] = None) -> None:
+        """Wait until the sweep started by start_sweep() is finished.
+        The instrument requests service at the end of the sweep, so this does not poll;
+        the VISA resource must support service request events.
+        timeout is in seconds; None waits indefinitely.
+        """
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        visa_handle = self.visa_handle
+        if not self._service_request_enabled:
+            # request service when the sweeping bit (3) of the operation condition clears
+            self.write("STAT:OPER:PTR 0;NTR 8;ENAB 8;*SRE 128")
+            visa_handle.enable_event(SERVICE_REQUEST, constants.EventMechanism.queue)
+            self._service_request_enabled = True
+        # reading the event register clears service requests left over from earlier
+        # sweeps without touching the error queue like *CLS would
+        self.ask("STAT:OPER:EVEN?")
+        visa_handle.discard_events(SERVICE_REQUEST, constants.EventMechanism.queue)
+        if self.sweep_done():
+            return  # finished before the events were cleared
+        # wait in short intervals so that the wait can be interrupted
+        while visa_handle.wait_on_event(
+            SERVICE_REQUEST, 1000, capture_timeout=True
+        ).timed_out:
+            if timeout is not None and time.monotonic() > deadline:
+                raise TimeoutError("The sweep did not finish in time.")
+        self.ask("STAT:OPER:EVEN?")  # clear the service request
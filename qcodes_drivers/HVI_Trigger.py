@@ -1,4 +1,5 @@
 import os
+import socket
 import sys
 from multiprocessing.connection import Client
 from subprocess import CREATE_NEW_CONSOLE, Popen
@@ -51,6 +52,13 @@ class HVI_Trigger(Instrument):
             Popen(f"cmd /k {sys.executable} hvi_daemon.py", creationflags=CREATE_NEW_CONSOLE, cwd=os.path.dirname(__file__))
             self.hvi_daemon = Client(address)
 
+        # send commands immediately instead of waiting to coalesce them
+        sock = socket.socket(fileno=self.hvi_daemon.fileno())
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        finally:
+            sock.detach()  # the connection still owns the socket
+
         # open HVI file
         hvi_name = f'InternalTrigger_{self.awg_count}_{self.dig_count}.HVI'
         dir_path = os.path.dirname(os.path.realpath(__file__))
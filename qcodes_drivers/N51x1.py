@@ -5,8 +5,10 @@ from qcodes import Function, Parameter
 from qcodes.parameters import create_on_off_val_mapping
 from qcodes.validators import Numbers
 
+from .scpi_batch import ScpiBatchMixin
 
-class N51x1(VisaInstrument):
+
+class N51x1(ScpiBatchMixin, VisaInstrument):
     """
     This is the qcodes driver for Keysight/Agilent scalar RF sources.
     It has been tested with N5171B, N5181A, N5173B, N5183B
@@ -15,7 +17,10 @@ class N51x1(VisaInstrument):
     def __init__(self, name: str, address: str, min_power: int = -144, max_power: int = 19, **kwargs: Any):
         super().__init__(name, address, terminator='\n', **kwargs)
 
-        self._options = self.ask("*OPT?")
+        # e.g. '"503,1E1,UNT"' -> {"503", "1E1", "UNT"}
+        self._options = frozenset(
+            option.strip() for option in self.ask("*OPT?").strip('"').split(",")
+        )
         # Determine installed frequency option
         freq_dict = {
             "501": 1e9,
@@ -27,10 +32,9 @@ class N51x1(VisaInstrument):
             "540": 40e9,
         }
 
-        frequency_option = None
-        for f_option in freq_dict.keys():
-            if f_option in self._options:
-                frequency_option = f_option
+        frequency_option = next(
+            (f_option for f_option in freq_dict if f_option in self._options), None
+        )
         if frequency_option is None:
             raise RuntimeError("Could not determine the frequency option")
 
@@ -94,8 +98,9 @@ class N51x1(VisaInstrument):
 
     def get_idn(self) -> Dict[str, Optional[str]]:
         IDN_str = self.ask_raw('*IDN?')
-        vendor, model, serial, firmware = map(str.strip, IDN_str.split(','))
+        # maxsplit=3 keeps any commas in the firmware field
+        vendor, model, serial, firmware = IDN_str.split(',', 3)
         IDN: Dict[str, Optional[str]] = {
-            'vendor': vendor, 'model': model,
-            'serial': serial, 'firmware': firmware}
+            'vendor': vendor.strip(), 'model': model.strip(),
+            'serial': serial.strip(), 'firmware': firmware.strip()}
         return IDN
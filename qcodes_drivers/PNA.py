@@ -102,6 +102,8 @@ class PNA(VisaInstrument):
 
         # get measured trace in float64
         self.write("FORM REAL,64")
+        # read binary traces in 1 MiB chunks instead of the default 20 kB
+        self.visa_handle.chunk_size = 1 << 20
 
         # restore default settings, turn off output, and set trigger_source = manual
         self.add_function(
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from threading import RLock
+from threading import Lock
 
 import numpy as np
 from qcodes.instrument.channel import ChannelList, InstrumentChannel
@@ -9,6 +9,15 @@ from qcodes.utils.validators import Bool, Enum, Ints, Numbers
 
 from .SD_Module import SD_Module, check_error, keysightSD1
 
+TRIGGER_BEHAVIOR_CODES = {'high': 1, 'low': 2, 'rise': 3, 'fall': 4}
+# AWGqueueWaveform trigger modes for (trigger, per_cycle)
+QUEUE_TRIGGER_MODES = {('auto', False)        : 0,
+                       ('auto', True)         : 0,
+                       ('software/hvi', False): 1,
+                       ('software/hvi', True) : 5,
+                       ('external', False)    : 2,
+                       ('external', True)     : 6}
+
 
 def new_waveform(data: np.ndarray, suppress_nonzero_warning=False, append_zeros=False) -> keysightSD1.SD_Wave:
     """Create an SD_Wave object from a 1D numpy array in volts with dtype=float64.
@@ -24,21 +33,25 @@ def new_waveform(data: np.ndarray, suppress_nonzero_warning=False, append_zeros=
     """
     if data.dtype != np.float64 or data.ndim != 1:
         raise Exception('waveform must be a 1D numpy array with dtype=float64')
-    if np.any(abs(data) > 1.5):
+    # two reductions instead of temporary |data| and boolean arrays
+    if len(data) > 0 and (data.max() > 1.5 or data.min() < -1.5):
         raise Exception('waveform must be between -1.5 V and 1.5 V')
+    length = len(data)
     if append_zeros:
-        append_length = 10 - len(data) % 10
-        data = np.append(data, np.zeros(append_length))
-    if len(data) % 10 != 0 or len(data) < 20:
+        length += 10 - length % 10
+    if length % 10 != 0 or length < 20:
         raise Exception('waveform length must be a multiple of 10 and >= 20')
-    if data[-1] != 0 and not suppress_nonzero_warning:
+    if not append_zeros and data[-1] != 0 and not suppress_nonzero_warning:
         raise Exception('the last value in the waveform must be zero because '
                         'the AWG will keep outputting that value until the '
                         'next waveform is played; set suppress_nonzero_warning '
                         '= True to suppress this error')
+    # normalize to -1...1 and append the zeros in a single output array
+    normalized = np.zeros(length)
+    np.divide(data, 1.5, out=normalized[:len(data)])
     sd_wave = keysightSD1.SD_Wave()
     waveform_type = keysightSD1.SD_WaveformTypes.WAVE_ANALOG
-    r = sd_wave.newFromArrayDouble(waveform_type, data / 1.5)
+    r = sd_wave.newFromArrayDouble(waveform_type, normalized)
     check_error(r, f'newFromArrayDouble({waveform_type}, data)')
     return sd_wave
 
@@ -160,9 +173,13 @@ class SD_AWG_CHANNEL(InstrumentChannel):
         check_error(r, f'channelOffset({self.channel}, {offset})')
 
     def _write_AWGtriggerExternalConfig(self):
-        source = {'external': 0, 'pxi': 4000 + self.pxi_trigger_number()}[self.trigger_source()]
-        behavior = {'high': 1, 'low': 2, 'rise': 3, 'fall': 4}[self.trigger_behavior()]
-        sync = {False: 0, True: 1}[self.trigger_sync_clk10()]
+        # the parameters are manual, so read their caches directly
+        if self.trigger_source.cache() == 'pxi':
+            source = 4000 + self.pxi_trigger_number.cache()
+        else:
+            source = 0
+        behavior = TRIGGER_BEHAVIOR_CODES[self.trigger_behavior.cache()]
+        sync = int(self.trigger_sync_clk10.cache())
         r = self.parent.awg.AWGtriggerExternalConfig(self.channel, source, behavior, sync)
         check_error(r, f'AWGtriggerExternalConfig({self.channel}, {source}, {behavior}, {sync})')
 
@@ -183,7 +200,7 @@ class SD_AWG_CHANNEL(InstrumentChannel):
         self._write_AWGtriggerExternalConfig()
 
     def _set_cyclic(self, value: bool):
-        cyclic = {False: 0, True: 1}[value]
+        cyclic = int(value)
         r = self.parent.awg.AWGqueueConfig(self.channel, cyclic)
         check_error(r, f'AWGqueueConfig({self.channel}, {cyclic})')
 
@@ -200,12 +217,7 @@ class SD_AWG_CHANNEL(InstrumentChannel):
             raise Exception('number of cycles must be a non-negative integer')
         if delay < 0 or delay % 10 != 0:
             raise Exception('delay must be a non-negative multiple of 10')
-        mode = {('auto', False)        : 0,
-                ('auto', True)         : 0,
-                ('software/hvi', False): 1,
-                ('software/hvi', True) : 5,
-                ('external', False)    : 2,
-                ('external', True)     : 6}[trigger, per_cycle]
+        mode = QUEUE_TRIGGER_MODES[trigger, per_cycle]
         delay_10 = delay // 10
         PRESCALER = 0  # always use maximum sampling rate
         r = self.parent.awg.AWGqueueWaveform(self.channel, waveform_id, mode, delay_10, cycles, PRESCALER)
@@ -249,7 +261,7 @@ class SD_AWG(SD_Module):
         super().__init__(name, chassis, slot, module_class=keysightSD1.SD_AOU, **kwargs)
 
         # Lock to avoid concurrent access of waveformLoad()/waveformReLoad()
-        self._lock = RLock()
+        self._lock = Lock()  # the locked sections never nest
 
         # store card-specifics
         self.num_channels = num_channels
@@ -322,6 +334,29 @@ class SD_AWG(SD_Module):
         check_error(r, f'waveformLoad(waveform_object, {waveform_id})')
         return r
 
+    def load_waveforms(self, waveforms: dict[int, np.ndarray],
+                       suppress_nonzero_warning=False, append_zeros=False) -> int:
+        """Load several waveforms into the module onboard RAM.
+        All waveforms are validated before any of them is loaded.
+        args:
+            waveforms = {waveform_id: data} with the same conventions as load_waveform
+            suppress_nonzero_warning, append_zeros = same as load_waveform, for all waveforms
+        returns:
+            available onboard RAM in waveform points
+        """
+        if len(waveforms) == 0:
+            raise Exception('waveforms must contain at least one waveform')
+        waveform_objects = {
+            waveform_id: new_waveform(data, suppress_nonzero_warning, append_zeros)
+            for waveform_id, data in waveforms.items()
+        }
+        # Lock to avoid concurrent access of waveformLoad()/waveformReLoad()
+        with self._lock:
+            for waveform_id, waveform_object in waveform_objects.items():
+                r = self.awg.waveformLoad(waveform_object, waveform_id)
+                check_error(r, f'waveformLoad(waveform_object, {waveform_id})')
+        return r
+
     def reload_waveform(self, data: np.ndarray, waveform_id: int,
                         suppress_nonzero_warning=False, append_zeros=False) -> int:
         """Replace a waveform located in the module onboard RAM.
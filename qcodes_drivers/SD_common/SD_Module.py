@@ -23,7 +23,7 @@ def check_error(value: Any, name: str = 'result'):
         value: the value to be parsed
         name: name of the value to be parsed
     """
-    if isinstance(value, int) and (int(value) < 0):
+    if isinstance(value, int) and value < 0:
         error_message = keysightSD1.SD_Error.getErrorMessage(value)
         call_message = f' ({name})' if name != 'result' else ''
         raise Exception(f'Error in call to module ({value}): '
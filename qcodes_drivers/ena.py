@@ -51,6 +51,8 @@ class Ena(VisaInstrument):
 
         # get measured trace in float64
         self.write("FORM:DATA REAL")
+        # read binary traces in 1 MiB chunks instead of the default 20 kB
+        self.visa_handle.chunk_size = 1 << 20
 
         # restore default settings, turn off output, and set trigger_source = bus
         self.add_function(
@@ -1,6 +1,10 @@
+import logging
 import os
+import socket
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from multiprocessing.connection import Listener
+from queue import SimpleQueue
 from typing import Any
 
 import win32console
@@ -21,6 +25,14 @@ screen_buffer.SetConsoleMode(new_mode | ENABLE_EXTENDED_FLAGS)
 os.system("title hvi_daemon")
 print("HVI_Trigger loads faster if you keep me open.")
 
+# write log messages to the console from a background thread
+log_queue = SimpleQueue()
+log_listener = QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+log_listener.start()
+logger = logging.getLogger("hvi_daemon")
+logger.addHandler(QueueHandler(log_queue))
+logger.setLevel(logging.INFO)  # set to logging.DEBUG to see every command
+
 hvi = keysightSD1.SD_HVI()
 
 
@@ -36,48 +48,77 @@ def check_error(return_value: Any, method_name: str):
 
 
 current_file = None
+hvi_open = hvi.open
+hvi_assign_hardware = hvi.assignHardwareWithUserNameAndSlot
 
 
-def call_method(name, *args):
+def open_file(file: str):
     global current_file
-    if name == "open":
-        if args[0] != current_file:
-            print(f"opening {args[0]}...", end="", flush=True)
-            r = hvi.open(args[0])
-            check_error(r, f"open('{args[0]}')")
-            print("done")
-            current_file = args[0]
-        connection.send("done")
-    elif name == "start":
-        r = hvi.start()
-        check_error(r, "start()")
-        print("HVI started")
-    elif name == "stop":
-        r = hvi.stop()
-        check_error(r, "stop()")
-        print("HVI stopped")
-    elif name == "writeIntegerConstantWithUserName":
-        r = hvi.writeIntegerConstantWithUserName(*args)
-        check_error(r, f"writeIntegerConstantWithUserName{args}")
-        print(f"wrote constant {args[1]}={args[2]} in {args[0]}")
-    elif name == "compile":
-        r = hvi.compile()
-        check_error(r, "compile()")
-        print("HVI compiled")
-    elif name == "load":
-        r = hvi.load()
-        check_error(r, "load()")
-        print("HVI loaded")
-    elif name == "assignHardwareWithUserNameAndSlot":
-        r = hvi.assignHardwareWithUserNameAndSlot(*args)
-        if (
-            r != keysightSD1.SD_Error.CHASSIS_SETUP_FAILED
-        ):  # ignore CHASSIS_SETUP_FAILED error
-            check_error(r, f"assignHardwareWithUserNameAndSlot{args}")
-        print(f"assigned chassis {args[1]} slot {args[2]} to {args[0]}", flush=True)
-        connection.send("done")
-    else:
+    if file != current_file:
+        logger.info(f"opening {file}")
+        r = hvi_open(file)
+        check_error(r, f"open('{file}')")
+        logger.info(f"opened {file}")
+        current_file = file
+    connection.send("done")
+
+
+def hvi_method(name: str, message: str, level=logging.INFO):
+    """Wrap a method of hvi that only needs its return value checked.
+    The method is looked up here, so a missing method fails at startup.
+    message is formatted with the arguments and logged after a successful call.
+    """
+    method = getattr(hvi, name)
+
+    def call(*args):
+        r = method(*args)
+        check_error(r, f"{name}{args}")
+        if logger.isEnabledFor(level):
+            logger.log(level, message.format(*args))
+
+    return call
+
+
+def assign_hardware(*args):
+    r = hvi_assign_hardware(*args)
+    if (
+        r != keysightSD1.SD_Error.CHASSIS_SETUP_FAILED
+    ):  # ignore CHASSIS_SETUP_FAILED error
+        check_error(r, f"assignHardwareWithUserNameAndSlot{args}")
+    logger.info(f"assigned chassis {args[1]} slot {args[2]} to {args[0]}")
+    connection.send("done")
+
+
+methods = {
+    "open": open_file,
+    "start": hvi_method("start", "HVI started"),
+    "stop": hvi_method("stop", "HVI stopped"),
+    "writeIntegerConstantWithUserName": hvi_method(
+        "writeIntegerConstantWithUserName",
+        "wrote constant {1}={2} in {0}",
+        logging.DEBUG,
+    ),
+    "compile": hvi_method("compile", "HVI compiled", logging.DEBUG),
+    "load": hvi_method("load", "HVI loaded", logging.DEBUG),
+    "assignHardwareWithUserNameAndSlot": assign_hardware,
+}
+
+
+def disable_nagle(connection):
+    """Send small messages immediately instead of waiting to coalesce them."""
+    sock = socket.socket(fileno=connection.fileno())
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    finally:
+        sock.detach()  # the connection still owns the socket
+
+
+def call_method(name, *args):
+    try:
+        method = methods[name]
+    except KeyError:
         raise NotImplementedError(name)
+    method(*args)
 
 
 try:
@@ -85,12 +126,14 @@ try:
         while True:
             try:
                 with listener.accept() as connection:
-                    print("connection accepted from", listener.last_accepted)
+                    logger.info(f"connection accepted from {listener.last_accepted}")
+                    disable_nagle(connection)
                     while True:
                         call_method(*connection.recv())
             except (EOFError, ConnectionResetError):
                 hvi.stop()
-                print("connection closed")
+                logger.info("connection closed")
 finally:
     hvi.stop()
     hvi.close()
+    log_listener.stop()
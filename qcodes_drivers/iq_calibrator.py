@@ -1,4 +1,5 @@
-from typing import Sequence
+import math
+from typing import Callable, Optional, Sequence
 
 import numpy as np
 import qcodes as qc
@@ -9,6 +10,33 @@ from qcodes_drivers.E4407B import E4407B
 from qcodes_drivers.M3202A import M3202A, SD_AWG_CHANNEL
 
 
+def memoize_on_grid(function: Callable[[np.ndarray], float], resolution: float):
+    """Wrap function(x) so that points within the same resolution-sized grid cell are
+    measured only once. Nelder-Mead revisits such points when the simplex shrinks.
+    """
+    values = {}
+
+    def wrapped(x: np.ndarray) -> float:
+        key = tuple(np.rint(np.divide(x, resolution)).astype(int))
+        if key not in values:
+            values[key] = function(x)
+        return values[key]
+
+    return wrapped
+
+
+def quadratic_vertex(points: np.ndarray, values: Sequence[float]) -> Optional[np.ndarray]:
+    """Fit a 2-D quadratic to values at >= 6 points and return its minimum,
+    or None if the fitted surface has no minimum.
+    """
+    x, y = np.transpose(points)
+    design = np.column_stack([x * x, x * y, y * y, x, y, np.ones_like(x)])
+    a, b, c, d, e, _ = np.linalg.lstsq(design, values, rcond=None)[0]
+    if a <= 0 or 4 * a * c - b * b <= 0:  # not positive definite
+        return None
+    return np.linalg.solve([[2 * a, b], [b, 2 * c]], [-d, -e])
+
+
 class IQCalibrator:
     def __init__(
         self,
@@ -49,6 +77,8 @@ class IQCalibrator:
         self.reference_level_rf = reference_level_rf
         self.reference_level_leakage = reference_level_leakage
         self.i_amp = i_amp
+        self._cos_sin_cache = {}
+        self._loaded_i = None  # (if_freq, i_amp) loaded by _output_if within one sweep
 
     def minimize_lo_leakage(self, awg_resolution=1e-4):
         self.spectrum_analyzer.span(0)  # Hz
@@ -77,44 +107,82 @@ class IQCalibrator:
             writer.save_text("wiring.md", self.wiring)
             writer.save_dict("station_snapshot.json", self.station.snapshot())
             iteration = 0
-    
+
+            # bind to locals outside of measure()
+            set_i_offset = self.awg_i.dc_offset
+            set_q_offset = self.awg_q.dc_offset
+            get_trace_mean = self.spectrum_analyzer.trace_mean
+            add_data = writer.add_data
+
             def measure(i_offset: float, q_offset: float):
                 nonlocal iteration
-                self.awg_i.dc_offset(i_offset)
-                self.awg_q.dc_offset(q_offset)
-                dbm = self.spectrum_analyzer.trace_mean()
-                writer.add_data(
+                set_i_offset(i_offset)
+                set_q_offset(q_offset)
+                dbm = get_trace_mean()
+                add_data(
                     iteration=iteration,
                     i_offset=i_offset,
                     q_offset=q_offset,
                     lo_leakage=dbm,
                 )
                 iteration += 1
-                return 10 ** (dbm / 10)
+                return dbm
+
+            # the leakage power in mW is quadratic in the offsets, so jump to the
+            # vertex of a fitted quadratic and let Nelder-Mead refine from there
+            stencil = [x0, x1] + d * np.array(
+                [[0, 0], [1, 0], [-1, 0], [0, 1], [0, -1], [1, 1]]
+            )
+            powers = [10 ** (measure(*point) / 10) for point in stencil]
+            vertex = quadratic_vertex(stencil, powers)
+            if vertex is not None and np.all(np.abs(vertex - [x0, x1]) < 5 * d):
+                x0, x1 = vertex
+                d /= 10
 
             self.i_offset, self.q_offset = minimize(
-                lambda iq_offsets: measure(*iq_offsets),
+                memoize_on_grid(lambda iq_offsets: measure(*iq_offsets), awg_resolution),
                 [x0, x1],
                 method="Nelder-Mead",
                 options=dict(
                     initial_simplex=[[x0, x1], [x0 + d, x1], [x0, x1 + d]],
                     xatol=awg_resolution,
+                    fatol=np.inf,  # stop on xatol only; dBm readings are noisy
                 ),
             ).x
             measure(self.i_offset, self.q_offset)
 
+    def _cos_sin(self, if_freq: int) -> tuple[np.ndarray, np.ndarray]:
+        """cos(2π*if_freq*t) and sin(2π*if_freq*t), computed once per if_freq."""
+        if if_freq not in self._cos_sin_cache:
+            phase = 2 * np.pi * if_freq * np.arange(1000) / 1000
+            self._cos_sin_cache[if_freq] = np.cos(phase), np.sin(phase)
+        return self._cos_sin_cache[if_freq]
+
     def output_if(self, if_freq: int, i_amp: float, q_amp: float, theta: float):
-        t = np.arange(1000) / 1000
-        i = i_amp * np.cos(2 * np.pi * if_freq * t)
-        q = q_amp * np.sin(2 * np.pi * if_freq * t + theta)
+        self._loaded_i = None  # the awg may have been used by something else since
+        self._output_if(if_freq, i_amp, q_amp, theta)
+
+    def _output_if(self, if_freq: int, i_amp: float, q_amp: float, theta: float):
+        """Same as output_if, but only reloads q if i is unchanged since the last call.
+        Only for use within a sweep that has reset _loaded_i and does not touch the awg
+        otherwise.
+        """
+        cos, sin = self._cos_sin(if_freq)
+        i = i_amp * cos
+        # sin(ωt + theta) = sin(ωt) cos(theta) + cos(ωt) sin(theta)
+        q = (q_amp * math.cos(theta)) * sin + (q_amp * math.sin(theta)) * cos
         self.awg.stop_all()
-        self.awg.flush_waveform()
         self.awg_i.dc_offset(self.i_offset)
         self.awg_q.dc_offset(self.q_offset)
-        self.awg.load_waveform(i, 0, suppress_nonzero_warning=True)
-        self.awg.load_waveform(q, 1, suppress_nonzero_warning=True)
-        self.awg_i.queue_waveform(0, trigger="auto", cycles=0)
-        self.awg_q.queue_waveform(1, trigger="auto", cycles=0)
+        if self._loaded_i == (if_freq, i_amp):
+            # i and the queues are unchanged, so only replace q in place
+            self.awg.reload_waveform(q, 1, suppress_nonzero_warning=True)
+        else:
+            self.awg.flush_waveform()
+            self.awg.load_waveforms({0: i, 1: q}, suppress_nonzero_warning=True)
+            self.awg_i.queue_waveform(0, trigger="auto", cycles=0)
+            self.awg_q.queue_waveform(1, trigger="auto", cycles=0)
+            self._loaded_i = (if_freq, i_amp)
         self.awg.start_all()
 
     def minimize_image_sideband(self, awg_resolution=1e-3):
@@ -148,6 +216,7 @@ class IQCalibrator:
 
         name = f"iq_calibrator image_sideband slot{self.awg.slot_number()} ch{self.awg_i.channel} ch{self.awg_q.channel}"
 
+        self._loaded_i = None  # the first _output_if of the sweep does a full load
         try:
             with DDH5Writer(data, self.data_path, name=name) as writer:
                 writer.backup_file(self.files + [__file__])
@@ -156,41 +225,56 @@ class IQCalibrator:
 
                 for i in range(len(self.if_freqs)):
                     iteration = 0
+                    rows = []  # written to the file once per if_freq
+                    # measure() is only called with this if_freq
+                    self.spectrum_analyzer.center(self.lo_freq - self.if_freqs[i] * 1e6)
 
                     def measure(if_freq: int, i_amp: float, q_amp: float, theta: float):
                         nonlocal iteration
-                        self.output_if(if_freq, i_amp, q_amp, theta)
-                        self.spectrum_analyzer.center(self.lo_freq - if_freq * 1e6)
+                        self._output_if(if_freq, i_amp, q_amp, theta)
                         dbm = self.spectrum_analyzer.trace_mean()
-                        writer.add_data(
-                            if_freq=if_freq,
-                            iteration=iteration,
-                            i_amp=i_amp,
-                            q_amp=q_amp,
-                            theta=theta,
-                            image_sideband=dbm,
+                        rows.append(
+                            dict(
+                                if_freq=if_freq,
+                                iteration=iteration,
+                                i_amp=i_amp,
+                                q_amp=q_amp,
+                                theta=theta,
+                                image_sideband=dbm,
+                            )
                         )
                         iteration += 1
-                        return 10 ** (dbm / 10)
-
-                    x0, x1 = minimize(
-                        lambda x: measure(self.if_freqs[i], self.i_amp, *x),
-                        [x0, x1],
-                        method="Nelder-Mead",
-                        options=dict(
-                            initial_simplex=[[x0, x1], [x0 + d0, x1], [x0, x1 + d1]],
-                            xatol=awg_resolution,
-                        ),
-                    ).x
-                    self.q_amps[i] = x0
-                    self.thetas[i] = x1
-                    measure(
-                        self.if_freqs[i], self.i_amp, self.q_amps[i], self.thetas[i]
-                    )
+                        return dbm
+
+                    try:
+                        x0, x1 = minimize(
+                            memoize_on_grid(
+                                lambda x: measure(self.if_freqs[i], self.i_amp, *x),
+                                awg_resolution,
+                            ),
+                            [x0, x1],
+                            method="Nelder-Mead",
+                            options=dict(
+                                initial_simplex=[[x0, x1], [x0 + d0, x1], [x0, x1 + d1]],
+                                xatol=awg_resolution,
+                                fatol=np.inf,  # stop on xatol only; dBm readings are noisy
+                            ),
+                        ).x
+                        self.q_amps[i] = x0
+                        self.thetas[i] = x1
+                        measure(
+                            self.if_freqs[i], self.i_amp, self.q_amps[i], self.thetas[i]
+                        )
+                    finally:
+                        if rows:
+                            writer.add_data(
+                                **{key: [row[key] for row in rows] for key in rows[0]}
+                            )
                     d0 = 0.01
                     d1 = 0.01
         finally:
             self.awg.stop_all()
+            self._loaded_i = None
 
     def measure_rf_power(self):
         """Measure rf_power[mW] when
@@ -218,25 +302,30 @@ class IQCalibrator:
 
         name = f"iq_calibrator rf_power slot{self.awg.slot_number()} ch{self.awg_i.channel} ch{self.awg_q.channel}"
 
+        self._loaded_i = None  # the first _output_if of the sweep does a full load
         try:
             with DDH5Writer(data, self.data_path, name=name) as writer:
                 writer.backup_file(self.files + [__file__])
                 writer.save_text("wiring.md", self.wiring)
                 writer.save_dict("station_snapshot.json", self.station.snapshot())
 
+                # 1 MHz per point with the lo at index 500
+                traces = np.empty((len(self.if_freqs), 1001))
                 for i in range(len(self.if_freqs)):
-                    self.output_if(
+                    self._output_if(
                         self.if_freqs[i], self.i_amp, self.q_amps[i], self.thetas[i]
                     )
-                    trace = self.spectrum_analyzer.trace()
-                    writer.add_data(
-                        if_freq=self.if_freqs[i],
-                        i_amp=self.i_amp,
-                        q_amp=self.q_amps[i],
-                        theta=self.thetas[i],
-                        lo_leakage=trace[500],
-                        image_sideband=trace[500 - self.if_freqs[i]],
-                        rf_power=trace[500 + self.if_freqs[i]],
-                    )
+                    traces[i] = self.spectrum_analyzer.trace()
+                rows = np.arange(len(self.if_freqs))
+                writer.add_data(
+                    if_freq=self.if_freqs,
+                    i_amp=np.full(len(self.if_freqs), self.i_amp),
+                    q_amp=self.q_amps,
+                    theta=self.thetas,
+                    lo_leakage=traces[:, 500],
+                    image_sideband=traces[rows, 500 - self.if_freqs],
+                    rf_power=traces[rows, 500 + self.if_freqs],
+                )
         finally:
             self.awg.stop_all()
+            self._loaded_i = None
@@ -5,13 +5,30 @@ import numpy as np
 import qcodes as qc
 from numpy.typing import NDArray
 from plottr.data.datadict_storage import DataDict, DDH5Writer, search_datadict
-from scipy.fft import fft, fftfreq, fftshift, ifftshift
-from scipy.ndimage import convolve
-from scipy.optimize import least_squares
+from scipy.fft import fft, fftfreq, fftshift, ifft, ifftshift, next_fast_len
 
 from qcodes_drivers.E4407B import E4407B
 from qcodes_drivers.M3202A import M3202A, SD_AWG_CHANNEL
 
+# frequencies of a 1000-point FFT at 1 GS/s in MHz, in ascending order
+FREQS_MHZ = fftshift(fftfreq(1000, 0.001))
+
+
+def _interp_periodic(x: NDArray, xp: NDArray, fp: NDArray, period: float) -> NDArray:
+    """Same as np.interp(x, xp, f, period=period) for each row f of the 2D array fp,
+    but the sorting and searching of xp is done only once.
+    """
+    xp = xp % period
+    order = np.argsort(xp)
+    xp = xp[order]
+    fp = fp[:, order]
+    xp = np.concatenate([xp[-1:] - period, xp, xp[:1] + period])
+    fp = np.concatenate([fp[:, -1:], fp, fp[:, :1]], axis=1)
+    x = x % period
+    index = np.searchsorted(xp, x, side="right") - 1
+    weight = (x - xp[index]) / (xp[index + 1] - xp[index])
+    return fp[:, index] * (1 - weight) + fp[:, index + 1] * weight
+
 
 class IQCorrector:
     def __init__(
@@ -43,48 +60,50 @@ class IQCorrector:
 
         if_step = measured_if[1] - measured_if[0]
         if_freqs = ifftshift(np.arange(-500, 500, if_step))
-        i_amps = np.interp(if_freqs, measured_if, measured_i_amp, period=1000)
-        q_amps = np.interp(if_freqs, measured_if, measured_q_amp, period=1000)
-        thetas = np.interp(if_freqs, measured_if, measured_theta, period=1000)
-        rf_powers = np.interp(if_freqs, measured_if, measured_rf_power, period=1000)
-
-        max_amp = max(max(i_amps), max(q_amps))
-        i_amps /= max_amp
-        q_amps /= max_amp
-
-        # normalize i_amp and q_amp such that rf_powers are equal
-        rf_powers /= min(rf_powers)
-        i_amps /= np.sqrt(rf_powers)
-        q_amps /= np.sqrt(rf_powers)
-
-        def residual(x):
-            i_kernel = x.view(complex)[:len_kernel]
-            q_kernel = x.view(complex)[len_kernel:]
-            i_kernel_full = np.zeros(len(if_freqs), complex)
-            q_kernel_full = np.zeros(len(if_freqs), complex)
-            i_kernel_full[: len_kernel - len_kernel // 2] = i_kernel[len_kernel // 2 :]
-            q_kernel_full[: len_kernel - len_kernel // 2] = q_kernel[len_kernel // 2 :]
-            i_kernel_full[-(len_kernel // 2) :] = i_kernel[: len_kernel // 2]
-            q_kernel_full[-(len_kernel // 2) :] = q_kernel[: len_kernel // 2]
-            i_kernel_f = fft(i_kernel_full)
-            q_kernel_f = fft(q_kernel_full)
-            i_residual = (i_kernel_f - np.exp(-0.5j * thetas) * i_amps) * weight
-            q_residual = (q_kernel_f - np.exp(0.5j * thetas) * q_amps) * weight
-            return np.concatenate([i_residual, q_residual]).view(float)
-
-        init_i_kernel = np.zeros(len_kernel, dtype=complex)
-        init_q_kernel = np.zeros(len_kernel, dtype=complex)
-        init_i_kernel[len_kernel // 2] = 1
-        init_q_kernel[len_kernel // 2] = 1
+        measured_index = measured_if // if_step  # index of each measured_if in if_freqs
+        if len(np.unique(measured_index)) != len(measured_index):
+            raise ValueError("measured_index must not contain duplicates")
+        i_amps, q_amps, thetas, rf_powers = _interp_periodic(
+            if_freqs,
+            measured_if,
+            np.stack([measured_i_amp, measured_q_amp, measured_theta, measured_rf_power]),
+            period=1000,
+        )
+
+        # normalize i_amp and q_amp by their maximum and such that rf_powers are equal
+        max_amp = max(i_amps.max(), q_amps.max())
+        scale = np.sqrt(rf_powers.min() / rf_powers) / max_amp
+        i_amps *= scale
+        q_amps *= scale
+
+        # shifting the center of the kernel to t = 0 multiplies its FFT by a phase ramp
+        n_freqs = len(if_freqs)
+        phase_ramp = np.exp(2j * np.pi * np.arange(n_freqs) * (len_kernel // 2) / n_freqs)
+
+        # target spectra of i_kernel and q_kernel in the rows
+        kernel_f_target = np.stack(
+            [np.exp(-0.5j * thetas) * i_amps, np.exp(0.5j * thetas) * q_amps]
+        )
+
         weight = np.ones(len(if_freqs))
-        weight[measured_if // if_step] = fit_weight
-        x = least_squares(
-            residual,
-            np.concatenate([init_i_kernel, init_q_kernel]).view(float),
-            method="lm",
-        ).x
-        i_kernel = x.view(complex)[:len_kernel]
-        q_kernel = x.view(complex)[len_kernel:]
+        weight[measured_index] = fit_weight
+
+        # fft(kernel, n_freqs) * phase_ramp is linear in the kernel, so fitting the
+        # kernels to the targets is a weighted linear least squares problem
+        dft = np.exp(
+            -2j * np.pi * np.outer(np.arange(n_freqs), np.arange(len_kernel)) / n_freqs
+        )
+        i_kernel, q_kernel = np.linalg.lstsq(
+            (weight * phase_ramp)[:, None] * dft,
+            (kernel_f_target * weight).T,
+            rcond=None,
+        )[0].T
+
+        self.i_offset = i_offset
+        self.q_offset = q_offset
+        self.i_kernel = i_kernel
+        self.q_kernel = q_kernel
+        self._kernel_f_cache: dict[tuple[int, bool], tuple[NDArray, NDArray]] = {}
 
         if plot:
             plt.figure("i_kernel")
@@ -101,21 +120,15 @@ class IQCorrector:
             plt.xlabel("Time (ns)")
             plt.ylabel("Amplitude")
 
-            i_kernel_full = np.zeros(1000, dtype=np.complex128)
-            q_kernel_full = np.zeros(1000, dtype=np.complex128)
-            i_kernel_full[: len_kernel - len_kernel // 2] = i_kernel[len_kernel // 2 :]
-            q_kernel_full[: len_kernel - len_kernel // 2] = q_kernel[len_kernel // 2 :]
-            i_kernel_full[-(len_kernel // 2) :] = i_kernel[: len_kernel // 2]
-            q_kernel_full[-(len_kernel // 2) :] = q_kernel[: len_kernel // 2]
-            i_kernel_f = fftshift(fft(i_kernel_full))
-            q_kernel_f = fftshift(fft(q_kernel_full))
+            # same as the kernel FFTs used by correct(..., cyclic=True) for 1000 points
+            i_kernel_f, q_kernel_f = map(fftshift, self._kernel_f(1000, cyclic=True))
             i_kernel_f_phase = np.angle(i_kernel_f, deg=True)
             q_kernel_f_phase = np.angle(q_kernel_f, deg=True)
-            freqs = fftshift(fftfreq(1000, 0.001))
+            freqs = FREQS_MHZ
 
             plt.figure("abs")
-            plt.plot(measured_if, i_amps[measured_if // if_step], "o")
-            plt.plot(measured_if, q_amps[measured_if // if_step], "o")
+            plt.plot(measured_if, i_amps[measured_index], "o")
+            plt.plot(measured_if, q_amps[measured_index], "o")
             plt.plot(freqs, abs(i_kernel_f), "C0", label="i_kernel")
             plt.plot(freqs, abs(q_kernel_f), "C1", label="q_kernel")
             plt.legend()
@@ -130,27 +143,58 @@ class IQCorrector:
             plt.ylabel("Phase (deg)")
 
             plt.figure("phase imbalance")
-            plt.plot(measured_if, thetas[measured_if // if_step] / np.pi * 180, "o")
+            plt.plot(measured_if, thetas[measured_index] / np.pi * 180, "o")
             plt.plot(
                 freqs, (q_kernel_f_phase - i_kernel_f_phase + 180) % 360 - 180, "C0"
             )
             plt.xlabel("Frequency (MHz)")
             plt.ylabel("Phase (deg)")
 
-        self.i_offset = i_offset
-        self.q_offset = q_offset
-        self.i_kernel = i_kernel
-        self.q_kernel = q_kernel
+    def _kernel_f(self, n: int, cyclic: bool) -> tuple[NDArray, NDArray]:
+        """FFTs of i_kernel and q_kernel with length n, cached because correct() is
+        usually called many times with signals of the same length.
+        If cyclic, the center of the kernel is placed at t = 0 with wrap-around.
+        """
+        key = (n, cyclic)
+        if key not in self._kernel_f_cache:
+            if cyclic:
+                len_kernel = len(self.i_kernel)
+                index = (np.arange(len_kernel) - len_kernel // 2) % n
+                i_kernel_full = np.zeros(n, complex)
+                q_kernel_full = np.zeros(n, complex)
+                np.add.at(i_kernel_full, index, self.i_kernel)
+                np.add.at(q_kernel_full, index, self.q_kernel)
+                self._kernel_f_cache[key] = fft(i_kernel_full), fft(q_kernel_full)
+            else:
+                self._kernel_f_cache[key] = fft(self.i_kernel, n), fft(self.q_kernel, n)
+        return self._kernel_f_cache[key]
 
     def correct(self, signal: NDArray[np.complex128], cyclic=False):
+        n = signal.shape[-1]
         if cyclic:
-            i = convolve(signal, self.i_kernel, mode="wrap").real
-            q = convolve(signal, self.q_kernel, mode="wrap").imag
+            i_kernel_f, q_kernel_f = self._kernel_f(n, cyclic=True)
+            signal_f = fft(signal)
+            i = ifft(signal_f * i_kernel_f).real
+            q = ifft(signal_f * q_kernel_f).imag
         else:
-            i = convolve(signal, self.i_kernel, mode="constant").real
-            q = convolve(signal, self.q_kernel, mode="constant").imag
+            # linear convolution with zero padding; keep the samples aligned with signal
+            len_kernel = len(self.i_kernel)
+            n_fft = next_fast_len(n + len_kernel - 1)
+            i_kernel_f, q_kernel_f = self._kernel_f(n_fft, cyclic=False)
+            signal_f = fft(signal, n_fft)
+            start = len_kernel // 2
+            i = ifft(signal_f * i_kernel_f)[..., start : start + n].real
+            q = ifft(signal_f * q_kernel_f)[..., start : start + n].imag
         return i, q
 
+    def correct_batch(self, signals: NDArray[np.complex128], cyclic=True):
+        """Correct each row of a 2D array of signals with a single FFT call.
+        Returns i and q as 2D arrays of the same shape.
+        """
+        if signals.ndim != 2:
+            raise Exception("signals must be a 2D numpy array")
+        return self.correct(signals, cyclic)
+
     def check(
         self,
         files: Sequence[str],
@@ -204,35 +248,71 @@ class IQCorrector:
                 spectrum_writer.save_text("wiring.md", wiring)
                 spectrum_writer.save_dict("station_snapshot.json", station.snapshot())
 
+                if_freqs = np.arange(-500 + if_step, 500, if_step)
+                t = np.arange(1000) / 1000
+                phasors = np.exp(2j * np.pi * if_freqs[:, None] * t)
+                # correct() is linear, so the amplitude can be applied afterwards
+                i_phasors, q_phasors = self.correct_batch(phasors, cyclic=True)
+
+                # bind to locals outside of the loop
+                stop_all = awg.stop_all
+                start_all = awg.start_all
+                flush_waveform = awg.flush_waveform
+                load_waveforms = awg.load_waveforms
+                set_i_offset = self.awg_i.dc_offset
+                set_q_offset = self.awg_q.dc_offset
+                flush_queue_i = self.awg_i.flush_queue
+                flush_queue_q = self.awg_q.flush_queue
+                queue_i = self.awg_i.queue_waveform
+                queue_q = self.awg_q.queue_waveform
+                get_trace = spectrum_analyzer.trace
+                add_data = writer.add_data
+                add_spectrum_data = spectrum_writer.add_data
+                frequency = spectrum_analyzer.freq_axis()  # span, npts, and center are fixed
+
+                # 1 MHz per point with the lo at index 500
+                traces = np.empty((len(if_freqs), 1001))
+                rows = np.arange(len(if_freqs))
+                frequencies = np.tile(frequency, (len(if_freqs), 1))
                 for amp in amps:
-                    for if_freq in np.arange(-500 + if_step, 500, if_step):
-                        t = np.arange(1000) / 1000
-                        signal = amp * np.exp(2j * np.pi * if_freq * t)
-                        i, q = self.correct(signal, cyclic=True)
-                        awg.stop_all()
-                        awg.flush_waveform()
-                        self.awg_i.dc_offset(self.i_offset)
-                        self.awg_q.dc_offset(self.q_offset)
-                        awg.load_waveform(i, 0, suppress_nonzero_warning=True)
-                        awg.load_waveform(q, 1, suppress_nonzero_warning=True)
-                        self.awg_i.queue_waveform(0, trigger="auto", cycles=0)
-                        self.awg_q.queue_waveform(1, trigger="auto", cycles=0)
-                        awg.start_all()
-                        trace = spectrum_analyzer.trace()
-                        rf_power = trace[500 + if_freq]
-                        writer.add_data(
-                            amplitude=amp,
-                            if_freq=if_freq,
-                            lo_leakage=trace[500],
-                            image_sideband=trace[500 - if_freq],
-                            rf_power=rf_power,
-                            rf_power_per_amplitude_squared=10 ** (rf_power / 10) / amp**2
-                        )
-                        spectrum_writer.add_data(
-                            amplitude=amp,
-                            if_freq=if_freq,
-                            frequency=spectrum_analyzer.freq_axis(),
-                            power=trace,
-                        )
+                    # upload the waveform pairs of this amplitude once so that the
+                    # inner loop only has to requeue them
+                    stop_all()
+                    flush_waveform()
+                    set_i_offset(self.i_offset)
+                    set_q_offset(self.q_offset)
+                    load_waveforms(
+                        {
+                            2 * f + k: amp * phasors_k[f]
+                            for f in range(len(if_freqs))
+                            for k, phasors_k in enumerate((i_phasors, q_phasors))
+                        },
+                        suppress_nonzero_warning=True,
+                    )
+                    for f in range(len(if_freqs)):
+                        waveform_id = 2 * f  # a Python int, as keysightSD1 requires
+                        stop_all()
+                        flush_queue_i()
+                        flush_queue_q()
+                        queue_i(waveform_id, trigger="auto", cycles=0)
+                        queue_q(waveform_id + 1, trigger="auto", cycles=0)
+                        start_all()
+                        traces[f] = get_trace()
+                    # one write per amplitude instead of one per trace
+                    rf_power = traces[rows, 500 + if_freqs]
+                    add_data(
+                        amplitude=np.full(len(if_freqs), amp),
+                        if_freq=if_freqs,
+                        lo_leakage=traces[:, 500],
+                        image_sideband=traces[rows, 500 - if_freqs],
+                        rf_power=rf_power,
+                        rf_power_per_amplitude_squared=10 ** (rf_power / 10) / amp**2
+                    )
+                    add_spectrum_data(
+                        amplitude=np.full(len(if_freqs), amp),
+                        if_freq=if_freqs,
+                        frequency=frequencies,
+                        power=traces,
+                    )
         finally:
             awg.stop_all()
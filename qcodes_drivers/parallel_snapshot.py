@@ -0,0 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, Sequence
+
+from qcodes import VisaInstrument
+
+
+def parallel_snapshot(
+    instruments: Sequence[VisaInstrument], update: Optional[bool] = True
+) -> dict[str, dict[Any, Any]]:
+    """Snapshot several instruments at the same time, one thread per instrument.
+    Each instrument has its own VISA session and pyvisa releases the GIL while it
+    waits for a reply, so the total time is that of the slowest instrument.
+    """
+    if len(instruments) == 0:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(instruments)) as executor:
+        snapshots = executor.map(lambda i: i.snapshot(update=update), instruments)
+        return {
+            instrument.name: snapshot
+            for instrument, snapshot in zip(instruments, snapshots)
+        }
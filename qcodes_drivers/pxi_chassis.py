@@ -1,10 +1,8 @@
 import ctypes
 import os
-from functools import partial
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 from qcodes import ChannelList, Instrument, InstrumentChannel, Parameter
-from qcodes.instrument.parameter import invert_val_mapping
 
 from .pxi_trigger_manager import PxiTriggerManager
 
@@ -46,38 +44,30 @@ class PxiChassisTriggerPort(InstrumentChannel):
         self.connected_bus_segment = Parameter(
             name="connected_bus_segment",
             instrument=self,
-            get_cmd=partial(
-                self.parent._get_vi_int,
-                KTMPXICHASSIS_ATTR_TRIGGER_PORT_CONNECTED_PXI_TRIGGER_BUS_SEGMENT,
+            get_cmd=self.parent._make_int_getter(
+                KTMPXICHASSIS_ATTR_TRIGGER_PORT_CONNECTED_PXI_TRIGGER_BUS_SEGMENT
             ),
             set_cmd=False,  # firmware = 2017 and 2019StdTrig does not support changing this parameter
         )
         self.drive_type = Parameter(
             name="drive_type",
             instrument=self,
-            get_cmd=partial(
-                self.parent._get_vi_int,
-                KTMPXICHASSIS_ATTR_TRIGGER_PORT_DRIVE_TYPE,
-                repcap=self.id,
+            get_cmd=self.parent._make_int_getter(
+                KTMPXICHASSIS_ATTR_TRIGGER_PORT_DRIVE_TYPE, self.id
             ),
-            set_cmd=partial(
-                self.parent._set_vi_int,
-                KTMPXICHASSIS_ATTR_TRIGGER_PORT_DRIVE_TYPE,
-                repcap=self.id,
+            set_cmd=self.parent._make_int_setter(
+                KTMPXICHASSIS_ATTR_TRIGGER_PORT_DRIVE_TYPE, self.id
             ),
             val_mapping={"input": 0, "push pull output": 1, "open drain output": 2},
         )
 
         trigger_line_mapping = {n: 2 ** n for n in range(8)}
         trigger_line_mapping["none"] = 0
-        self.trigger_line_mapping_inverse = invert_val_mapping(trigger_line_mapping)
         self.input_destination = Parameter(
             name="input_destination",
             instrument=self,
-            get_cmd=partial(
-                self.parent._get_vi_int,
-                KTMPXICHASSIS_ATTR_TRIGGER_PORT_INPUT_DESTINATION,
-                repcap=self.id,
+            get_cmd=self.parent._make_int_getter(
+                KTMPXICHASSIS_ATTR_TRIGGER_PORT_INPUT_DESTINATION, self.id
             ),
             set_cmd=self._set_input_destination,
             val_mapping=trigger_line_mapping,
@@ -85,22 +75,18 @@ class PxiChassisTriggerPort(InstrumentChannel):
         self.output_source = Parameter(
             name="output_source",
             instrument=self,
-            get_cmd=partial(
-                self.parent._get_vi_int,
-                KTMPXICHASSIS_ATTR_TRIGGER_PORT_OUTPUT_SOURCE,
-                repcap=self.id,
+            get_cmd=self.parent._make_int_getter(
+                KTMPXICHASSIS_ATTR_TRIGGER_PORT_OUTPUT_SOURCE, self.id
             ),
-            set_cmd=partial(
-                self.parent._set_vi_int,
-                KTMPXICHASSIS_ATTR_TRIGGER_PORT_OUTPUT_SOURCE,
-                repcap=self.id,
+            set_cmd=self.parent._make_int_setter(
+                KTMPXICHASSIS_ATTR_TRIGGER_PORT_OUTPUT_SOURCE, self.id
             ),
             val_mapping=trigger_line_mapping,
         )
 
     def _set_input_destination(self, trigger_line_code: int):
-        line = self.trigger_line_mapping_inverse[trigger_line_code]
-        if line != "none":
+        if trigger_line_code != 0:  # trigger_line_code = 2 ** line
+            line = trigger_line_code.bit_length() - 1
             segment = self.connected_bus_segment()
             self.trigger_manager.reserve(segment, line)
         self.parent._set_vi_int(
@@ -134,6 +120,17 @@ class PxiChassis(Instrument):
         super().__init__(name, **kwargs)
         self.address = address
         self._dll = ctypes.cdll.LoadLibrary(dll_path)
+        self._declare_dll_functions()
+        self._get_attr_str = self._dll.KtMPxiChassis_GetAttributeViString
+        self._get_attr_i32 = self._dll.KtMPxiChassis_GetAttributeViInt32
+        self._set_attr_i32 = self._dll.KtMPxiChassis_SetAttributeViInt32
+
+        # reused by _get_vi_int and _get_vi_string to avoid allocating per call;
+        # this assumes that the instrument is accessed from a single thread
+        self._vi_int_buf = ctypes.c_int32(0)
+        self._vi_int_ref = ctypes.byref(self._vi_int_buf)
+        self._vi_string_buf = ctypes.create_string_buffer(self._default_buf_size)
+
         self._session = self._connect(address, query_id, reset, options)
 
         if not self.get_idn()["firmware"].endswith(", 0"):
@@ -154,6 +151,37 @@ class PxiChassis(Instrument):
         trigger_ports.lock()
         self.add_submodule("trigger_ports", trigger_ports)
 
+    def _declare_dll_functions(self) -> None:
+        """Declare the C signatures so that ctypes does not have to infer the
+        argument types on every call.
+        """
+        vi_session = ctypes.c_int
+        vi_status = ctypes.c_int32
+        vi_attr = ctypes.c_uint32
+        vi_int32 = ctypes.c_int32
+        vi_int32_p = ctypes.POINTER(ctypes.c_int32)
+        vi_string = ctypes.c_char_p
+        vi_boolean = ctypes.c_uint16
+        prototypes = {
+            "KtMPxiChassis_InitWithOptions": [
+                vi_string, vi_boolean, vi_boolean, vi_string, ctypes.POINTER(vi_session)
+            ],
+            "KtMPxiChassis_close": [vi_session],
+            "KtMPxiChassis_GetAttributeViString": [
+                vi_session, vi_string, vi_attr, vi_int32, ctypes.c_char_p
+            ],
+            "KtMPxiChassis_GetAttributeViInt32": [
+                vi_session, vi_string, vi_attr, vi_int32_p
+            ],
+            "KtMPxiChassis_SetAttributeViInt32": [
+                vi_session, vi_string, vi_attr, vi_int32
+            ],
+        }
+        for name, argtypes in prototypes.items():
+            function = getattr(self._dll, name)
+            function.argtypes = argtypes
+            function.restype = vi_status
+
     def _connect(
         self, address: str, query_id: bool, reset: bool, options: str
     ) -> ctypes.c_int:
@@ -180,14 +208,23 @@ class PxiChassis(Instrument):
         )
 
     def close(self) -> None:
-        self.trigger_ports.drive_type("input")
-        self.trigger_ports.input_destination("none")
+        # same as drive_type("input") and input_destination("none") on each port,
+        # which need no trigger line reservation
+        for trigger_port in self.trigger_ports:
+            self._set_vi_int(
+                KTMPXICHASSIS_ATTR_TRIGGER_PORT_DRIVE_TYPE, 0, repcap=trigger_port.id
+            )
+            self._set_vi_int(
+                KTMPXICHASSIS_ATTR_TRIGGER_PORT_INPUT_DESTINATION,
+                0,
+                repcap=trigger_port.id,
+            )
         self._dll.KtMPxiChassis_close(self._session)
         super().close()
 
     def _get_vi_string(self, attr: int, repcap: bytes = b"") -> str:
-        v = ctypes.create_string_buffer(self._default_buf_size)
-        status = self._dll.KtMPxiChassis_GetAttributeViString(
+        v = self._vi_string_buf
+        status = self._get_attr_str(
             self._session, repcap, attr, self._default_buf_size, v
         )
         if status:
@@ -195,18 +232,47 @@ class PxiChassis(Instrument):
         return v.value.decode()
 
     def _get_vi_int(self, attr: int, repcap: bytes = b"") -> int:
-        v = ctypes.c_int32(0)
-        status = self._dll.KtMPxiChassis_GetAttributeViInt32(
-            self._session, repcap, attr, ctypes.byref(v)
+        status = self._get_attr_i32(
+            self._session, repcap, attr, self._vi_int_ref
         )
         if status:
             raise Exception(f"Driver error: {status}")
-        return int(v.value)
+        return int(self._vi_int_buf.value)
+
+    def _make_int_getter(self, attr: int, repcap: bytes = b"") -> Callable[[], int]:
+        """Same as partial(self._get_vi_int, attr, repcap=repcap) but binds the DLL
+        function, the session, and a dedicated ctypes buffer once.
+        """
+        function = self._get_attr_i32
+        session = self._session
+        v = ctypes.c_int32(0)
+        v_ref = ctypes.byref(v)
+
+        def get_value() -> int:
+            status = function(session, repcap, attr, v_ref)
+            if status:
+                raise Exception(f"Driver error: {status}")
+            return int(v.value)
+
+        return get_value
+
+    def _make_int_setter(self, attr: int, repcap: bytes = b"") -> Callable[[int], None]:
+        """Same as partial(self._set_vi_int, attr, repcap=repcap) but binds the DLL
+        function and the session once.
+        """
+        function = self._set_attr_i32
+        session = self._session
+
+        def set_value(value: int) -> None:
+            status = function(session, repcap, attr, value)
+            if status:
+                raise Exception(f"Driver error: {status}")
+
+        return set_value
 
     def _set_vi_int(self, attr: int, value: int, repcap: bytes = b"") -> None:
-        v = ctypes.c_int32(value)
-        status = self._dll.KtMPxiChassis_SetAttributeViInt32(
-            self._session, repcap, attr, v
+        status = self._set_attr_i32(
+            self._session, repcap, attr, value
         )
         if status:
             raise Exception(f"Driver error: {status}")
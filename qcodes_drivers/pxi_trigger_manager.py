@@ -32,26 +32,38 @@ class PxiTriggerManager(Instrument):
     ):
         super().__init__(name, **kwargs)
         self._dll = ctypes.cdll.LoadLibrary(dll_path)
+        self._declare_dll_functions()
+
+        # reused by every call to avoid allocating ctypes objects per call;
+        # this assumes that the instrument is accessed from a single thread
+        self._vi_int_buf = ctypes.c_int32(0)
+        self._vi_int_ref = ctypes.byref(self._vi_int_buf)
+        self._vi_string_buf = ctypes.create_string_buffer(self._default_buf_size)
+        self._reservation_status = ctypes.c_int32(0)
+        self._source_bus_segment = ctypes.c_int32(0)
+        self._source_trigger_line = ctypes.c_int32(0)
+
         self._session = self._connect(address, reset, options)
         self._dll.KtMTrig_SystemRedefineClientLabel(self._session, name.encode())
 
+        # fixed for the chassis, so kept as a plain int for the range checks
+        self._segment_count = self._get_vi_int(KTMTRIG_ATTR_SYSTEM_SEGMENT_COUNT)
         self.bus_segment_count = Parameter(
             name="bus_segment_count",
             instrument=self,
-            initial_cache_value=self._get_vi_int(KTMTRIG_ATTR_SYSTEM_SEGMENT_COUNT),
+            initial_cache_value=self._segment_count,
         )
 
         # determine which bus segment each slot belongs to
         self.slot_to_segment = {}
-        for segment in range(1, self.bus_segment_count() + 1):
-            v = ctypes.c_int32(0)
-            self._dll.KtMTrig_SystemQueryLowSlotOfBusSegment(self._session, segment, ctypes.byref(v))
-            low = int(v.value)
-            v = ctypes.c_int32(0)
-            self._dll.KtMTrig_SystemQueryHighSlotOfBusSegment(self._session, segment, ctypes.byref(v))
-            high = int(v.value)
-            for slot in range(low, high + 1):
-                self.slot_to_segment[slot] = segment
+        low = ctypes.c_int32(0)
+        high = ctypes.c_int32(0)
+        for segment in range(1, self._segment_count + 1):
+            self._dll.KtMTrig_SystemQueryLowSlotOfBusSegment(self._session, segment, ctypes.byref(low))
+            self._dll.KtMTrig_SystemQueryHighSlotOfBusSegment(self._session, segment, ctypes.byref(high))
+            self.slot_to_segment.update(
+                dict.fromkeys(range(low.value, high.value + 1), segment)
+            )
 
         self.reservations = Parameter(
             name="reservations",
@@ -66,6 +78,51 @@ class PxiTriggerManager(Instrument):
             docstring="call route() to add a route",
         )
 
+    def _declare_dll_functions(self) -> None:
+        """Declare the C signatures so that ctypes does not have to infer the
+        argument types on every call.
+        """
+        vi_session = ctypes.c_int
+        vi_status = ctypes.c_int32
+        vi_attr = ctypes.c_uint32
+        vi_int32 = ctypes.c_int32
+        vi_int32_p = ctypes.POINTER(ctypes.c_int32)
+        vi_string = ctypes.c_char_p
+        vi_boolean = ctypes.c_uint16
+        prototypes = {
+            "KtMTrig_InitWithOptions": [
+                vi_string, vi_boolean, vi_boolean, vi_string, ctypes.POINTER(vi_session)
+            ],
+            "KtMTrig_close": [vi_session],
+            "KtMTrig_GetAttributeViString": [
+                vi_session, vi_string, vi_attr, vi_int32, ctypes.c_char_p
+            ],
+            "KtMTrig_GetAttributeViInt32": [vi_session, vi_string, vi_attr, vi_int32_p],
+            "KtMTrig_SystemRedefineClientLabel": [vi_session, vi_string],
+            "KtMTrig_SystemQueryLowSlotOfBusSegment": [vi_session, vi_int32, vi_int32_p],
+            "KtMTrig_SystemQueryHighSlotOfBusSegment": [vi_session, vi_int32, vi_int32_p],
+            "KtMTrig_PXI9GetLineInformation": [
+                vi_session,
+                vi_int32,
+                vi_int32,
+                vi_int32_p,
+                vi_int32_p,
+                vi_int32_p,
+                vi_int32,
+                ctypes.c_char_p,
+            ],
+            "KtMTrig_PXI9SetReservation": [vi_session, vi_int32, vi_int32, vi_int32],
+            "KtMTrig_PXI9SetRoute": [vi_session, vi_int32, vi_int32, vi_int32, vi_int32],
+            "KtMTrig_PXI9ClearAllRoutesAndReservations": [vi_session],
+            "KtMTrig_SystemAdministrationClearAllRoutesAndReservationsSingleClient": [
+                vi_session, vi_string
+            ],
+        }
+        for name, argtypes in prototypes.items():
+            function = getattr(self._dll, name)
+            function.argtypes = argtypes
+            function.restype = vi_status
+
     def _connect(self, address: str, reset: bool, options: str) -> ctypes.c_int:
         session = ctypes.c_int(0)
         status = self._dll.KtMTrig_InitWithOptions(
@@ -92,19 +149,19 @@ class PxiTriggerManager(Instrument):
 
     def check_reservation(self, bus_segment: int, trigger_line: int) -> Optional[str]:
         """Returns the owner's name if the trigger line is reserved, None if not."""
-        assert 1 <= bus_segment <= self.bus_segment_count()
-        assert trigger_line in range(8)
-        reservation_status = ctypes.c_int32(0)
-        source_bus_segment = ctypes.c_int32(0)
-        source_trigger_line = ctypes.c_int32(0)
-        label = ctypes.create_string_buffer(self._default_buf_size)
+        if not 1 <= bus_segment <= self._segment_count:
+            raise ValueError(f"bus_segment must be between 1 and {self._segment_count}.")
+        if trigger_line & ~7:  # not in range(8)
+            raise ValueError("trigger_line must be between 0 and 7.")
+        reservation_status = self._reservation_status
+        label = self._vi_string_buf
         status = self._dll.KtMTrig_PXI9GetLineInformation(
             self._session,
-            ctypes.c_int32(bus_segment),
-            ctypes.c_int32(trigger_line),
+            bus_segment,
+            trigger_line,
             ctypes.byref(reservation_status),
-            ctypes.byref(source_bus_segment),
-            ctypes.byref(source_trigger_line),
+            ctypes.byref(self._source_bus_segment),
+            ctypes.byref(self._source_trigger_line),
             self._default_buf_size,
             label,
         )
@@ -116,16 +173,15 @@ class PxiTriggerManager(Instrument):
             return label.value.decode()
 
     def reserve(self, bus_segment: int, trigger_line: int) -> None:
-        assert 1 <= bus_segment <= self.bus_segment_count()
-        assert trigger_line in range(8)
+        # the arguments are validated by check_reservation
         reservation = self.check_reservation(bus_segment, trigger_line)
         if reservation is not None:
             raise Exception(f"The trigger line is reserved by {reservation}.")
         status = self._dll.KtMTrig_PXI9SetReservation(
             self._session,
-            ctypes.c_int32(bus_segment),
-            ctypes.c_int32(trigger_line),
-            ctypes.c_int32(1),
+            bus_segment,
+            trigger_line,
+            1,
         )
         if status:
             raise Exception(f"Driver error: {status}")
@@ -136,7 +192,8 @@ class PxiTriggerManager(Instrument):
     def route(
         self, source_bus_segment: int, destination_bus_segment: int, trigger_line: int
     ) -> None:
-        assert 1 <= source_bus_segment <= self.bus_segment_count()
+        if not 1 <= source_bus_segment <= self._segment_count:
+            raise ValueError(f"source_bus_segment must be between 1 and {self._segment_count}.")
         if (
             dict(bus_segment=destination_bus_segment, trigger_line=trigger_line)
             not in self.reservations()
@@ -144,10 +201,10 @@ class PxiTriggerManager(Instrument):
             raise Exception("You must reserve the destination first.")
         status = self._dll.KtMTrig_PXI9SetRoute(
             self._session,
-            ctypes.c_int32(source_bus_segment),
-            ctypes.c_int32(trigger_line),
-            ctypes.c_int32(destination_bus_segment),
-            ctypes.c_int32(trigger_line),
+            source_bus_segment,
+            trigger_line,
+            destination_bus_segment,
+            trigger_line,
         )
         if status:
             raise Exception(f"Driver error: {status}")
@@ -173,7 +230,7 @@ class PxiTriggerManager(Instrument):
         super().close()
 
     def _get_vi_string(self, attr: int, repcap: bytes = b"") -> str:
-        v = ctypes.create_string_buffer(self._default_buf_size)
+        v = self._vi_string_buf
         status = self._dll.KtMTrig_GetAttributeViString(
             self._session, repcap, attr, self._default_buf_size, v
         )
@@ -182,10 +239,9 @@ class PxiTriggerManager(Instrument):
         return v.value.decode()
 
     def _get_vi_int(self, attr: int, repcap: bytes = b"") -> int:
-        v = ctypes.c_int32(0)
         status = self._dll.KtMTrig_GetAttributeViInt32(
-            self._session, repcap, attr, ctypes.byref(v)
+            self._session, repcap, attr, self._vi_int_ref
         )
         if status:
             raise Exception(f"Driver error: {status}")
-        return int(v.value)
+        return int(self._vi_int_buf.value)
@@ -1,6 +1,9 @@
+import re
 import time
+from typing import Callable, Union
 
 import numpy as np
+from pyvisa import constants, errors
 from qcodes import (
     ChannelList,
     Function,
@@ -12,23 +15,58 @@ from qcodes import (
 from qcodes.utils.validators import Arrays, Enum, Ints, Numbers
 
 from .pxi_trigger_manager import PxiTriggerManager
+from .scpi_batch import ScpiBatchMixin
+
+# SCPI commands used for every trace
+FORMAT_QUERY = "CALC:MEAS1:FORM?"
+FDATA_QUERY = "CALC:MEAS1:DATA:FDATA?"
+POLAR_FDATA_QUERY = "CALC:MEAS1:FORM POL;:" + FDATA_QUERY
+
+# TCPIP{}::{hostname}::hislip_PXI{}_CHASSIS{}_SLOT{}_INDEX{}::INSTR
+HISLIP_ADDRESS = re.compile(r"hislip_PXI(\d+)_CHASSIS(\d+)_SLOT(\d+)_INDEX\d+")
+
+# the instrument requests service when all pending operations (the sweep) complete
+SERVICE_REQUEST = constants.EventType.service_request
+OPC_SERVICE_REQUEST = "*ESE 1;*SRE 32"  # OPC -> event status bit -> SRQ
 
 
 class LinSpaceSetpoints(Parameter):
     """A parameter which generates an array of evenly spaced setpoints from start, stop,
     and points parameters.
+    start and stop can also be fixed numbers.
+    The cached values of the parameters are used, so the instrument must
+    invalidate them whenever they change without being set directly.
+    The array is reused (read-only) until one of them changes.
     """
 
     def __init__(
-        self, name: str, start: Parameter, stop: Parameter, points: Parameter, **kwargs
+        self,
+        name: str,
+        start: Union[Parameter, float],
+        stop: Union[Parameter, float],
+        points: Parameter,
+        **kwargs,
     ):
         super().__init__(name, snapshot_get=False, snapshot_value=False, **kwargs)
-        self._start = start
-        self._stop = stop
-        self._points = points
+        self._get_start = self._value_getter(start)
+        self._get_stop = self._value_getter(stop)
+        self._get_points = points.cache.get
+        self._key = None
+        self._setpoints = None
+
+    @staticmethod
+    def _value_getter(value: Union[Parameter, float]) -> Callable[[], float]:
+        if isinstance(value, Parameter):
+            return value.cache.get
+        return lambda: value
 
     def get_raw(self):
-        return np.linspace(self._start(), self._stop(), self._points())
+        key = (self._get_start(), self._get_stop(), self._get_points())
+        if key != self._key:
+            self._setpoints = np.linspace(*key)
+            self._setpoints.flags.writeable = False
+            self._key = key
+        return self._setpoints
 
 
 class PxiVnaPort(InstrumentChannel):
@@ -55,7 +93,7 @@ class PxiVnaPort(InstrumentChannel):
         )
 
 
-class PxiVna(VisaInstrument):
+class PxiVna(ScpiBatchMixin, VisaInstrument):
     trigger_manager: PxiTriggerManager
     preset: Function
     manual_trigger: Function
@@ -79,18 +117,22 @@ class PxiVna(VisaInstrument):
         super().__init__(name, address, terminator="\n", **kwargs)
         self.min_freq = min_freq
         self.max_freq = max_freq
-        hislip_names = address.split("::")[2].split("_")
-        pxi_interface = int(hislip_names[1][len("PXI"):])
-        chassis = int(hislip_names[2][len("CHASSIS") :])
-        slot = int(hislip_names[3][len("SLOT") :])
+        match = HISLIP_ADDRESS.search(address)
+        if match is None:
+            raise ValueError(f"{address} is not a PXI HiSLIP address.")
+        pxi_interface, chassis, slot = map(int, match.groups())
 
         # get measured trace in float64; this is not reset by preset()
         self.write("FORM REAL,64")
+        # read binary traces in 1 MiB chunks instead of the default 20 kB
+        self.visa_handle.chunk_size = 1 << 20
+        # whether run_sweep can wait for a service request; decided on the first sweep
+        self._service_request_enabled: Union[bool, None] = None
 
         # restore default settings, turn off output, and stop triggering
         self.add_function(
             name="preset",
-            call_cmd="SYST:PRES;:OUTP OFF;:SENS:SWE:MODE HOLD",
+            call_cmd=self._preset,
         )
         self.preset()
 
@@ -183,7 +225,9 @@ class PxiVna(VisaInstrument):
             instrument=self,
             get_cmd="SENS:FREQ:STAR?",
             get_parser=float,
-            set_cmd="SENS:FREQ:STAR {}",
+            set_cmd=lambda x: self._write_and_invalidate(
+                f"SENS:FREQ:STAR {x}", self.stop, self.center, self.span
+            ),
             unit="Hz",
             vals=Numbers(min_freq, max_freq),
         )
@@ -192,7 +236,9 @@ class PxiVna(VisaInstrument):
             instrument=self,
             get_cmd="SENS:FREQ:STOP?",
             get_parser=float,
-            set_cmd="SENS:FREQ:STOP {}",
+            set_cmd=lambda x: self._write_and_invalidate(
+                f"SENS:FREQ:STOP {x}", self.start, self.center, self.span
+            ),
             unit="Hz",
             vals=Numbers(min_freq, max_freq),
         )
@@ -201,7 +247,9 @@ class PxiVna(VisaInstrument):
             instrument=self,
             get_cmd="SENS:FREQ:CENT?",
             get_parser=float,
-            set_cmd="SENS:FREQ:CENT {}",
+            set_cmd=lambda x: self._write_and_invalidate(
+                f"SENS:FREQ:CENT {x}", self.start, self.stop, self.span
+            ),
             unit="Hz",
             vals=Numbers(min_freq, max_freq),
         )
@@ -210,7 +258,9 @@ class PxiVna(VisaInstrument):
             instrument=self,
             get_cmd="SENS:FREQ:SPAN?",
             get_parser=float,
-            set_cmd="SENS:FREQ:SPAN {}",
+            set_cmd=lambda x: self._write_and_invalidate(
+                f"SENS:FREQ:SPAN {x}", self.start, self.stop, self.center
+            ),
             unit="Hz",
             vals=Numbers(70, max_freq - min_freq),
         )
@@ -230,7 +280,9 @@ class PxiVna(VisaInstrument):
             instrument=self,
             get_cmd="SOUR:POW:STAR?",
             get_parser=float,
-            set_cmd="SOUR:POW:STAR {}",
+            set_cmd=lambda x: self._write_and_invalidate(
+                f"SOUR:POW:STAR {x}", self.power_stop, self.power_center, self.power_span
+            ),
             unit="dBm",
             vals=Numbers(min_power, max_power),
         )
@@ -239,7 +291,9 @@ class PxiVna(VisaInstrument):
             instrument=self,
             get_cmd="SOUR:POW:STOP?",
             get_parser=float,
-            set_cmd="SOUR:POW:STOP {}",
+            set_cmd=lambda x: self._write_and_invalidate(
+                f"SOUR:POW:STOP {x}", self.power_start, self.power_center, self.power_span
+            ),
             unit="dBm",
             vals=Numbers(min_power, max_power),
         )
@@ -248,7 +302,9 @@ class PxiVna(VisaInstrument):
             instrument=self,
             get_cmd="SOUR:POW:CENT?",
             get_parser=float,
-            set_cmd="SOUR:POW:CENT {}",
+            set_cmd=lambda x: self._write_and_invalidate(
+                f"SOUR:POW:CENT {x}", self.power_start, self.power_stop, self.power_span
+            ),
             unit="dBm",
             vals=Numbers(min_power, max_power),
         )
@@ -257,7 +313,9 @@ class PxiVna(VisaInstrument):
             instrument=self,
             get_cmd="SOUR:POW:SPAN?",
             get_parser=float,
-            set_cmd="SOUR:POW:SPAN {}",
+            set_cmd=lambda x: self._write_and_invalidate(
+                f"SOUR:POW:SPAN {x}", self.power_start, self.power_stop, self.power_center
+            ),
             unit="dBm",
             vals=Numbers(0, max_power - min_power),
         )
@@ -280,6 +338,7 @@ class PxiVna(VisaInstrument):
             set_cmd="SENS:SWE:TIME {}",
             unit="s",
             vals=Numbers(min_value=0, max_value=86400),
+            max_val_age=0,  # computed by the instrument unless sweep_type = cw time
         )
 
         # for sweep_type = cw time
@@ -525,7 +584,7 @@ class PxiVna(VisaInstrument):
         self.format = Parameter(
             name="format",
             instrument=self,
-            get_cmd="CALC:MEAS1:FORM?",
+            get_cmd=FORMAT_QUERY,
             set_cmd="CALC:MEAS1:FORM {}",
             val_mapping={
                 "linear magnitude": "MLIN",
@@ -539,6 +598,17 @@ class PxiVna(VisaInstrument):
             },
         )
 
+    def _preset(self):
+        self.write("SYST:PRES;:OUTP OFF;:SENS:SWE:MODE HOLD")
+        for parameter in self.parameters.values():
+            parameter.cache.invalidate()
+
+    def _write_and_invalidate(self, cmd: str, *parameters: Parameter):
+        """Write cmd and invalidate the cache of parameters that it changes."""
+        self.write(cmd)
+        for parameter in parameters:
+            parameter.cache.invalidate()
+
     def _set_sweep_type(self, sweep_type: str):
         if sweep_type == "LIN":
             self.trace.setpoints = (self.frequencies,)
@@ -546,17 +616,26 @@ class PxiVna(VisaInstrument):
             self.trace.setpoints = (self.powers,)
         elif sweep_type == "CW":
             self.trace.setpoints = (self.times,)
+        cache = self.sweep_type.cache
+        if cache.valid and cache.raw_value == sweep_type:
+            return  # unchanged; custom setpoints are still replaced above
         self.write(f"SENS:SWE:TYPE {sweep_type}")
 
 
     def _get_trace(self) -> np.ndarray:
-        format = self.format()
-        self.format("polar")
+        # in polar format, FDATA returns interleaved real and imaginary parts;
+        # switch to it and back in the same message as the data query
+        self.format.cache.get()  # queries the instrument only if the cache is invalid
+        format = self.format.cache.raw_value
+        if format == "POL":
+            query = FDATA_QUERY
+        else:
+            query = f"{POLAR_FDATA_QUERY};:CALC:MEAS1:FORM {format}"
         data = self.visa_handle.query_binary_values(
-            "CALC:MEAS1:DATA:FDATA?", datatype="d", is_big_endian=True
+            query, datatype="d", is_big_endian=True, container=np.array
         )
-        self.format(format)
-        return np.array(data).view(complex)
+        # data is a read-only big-endian float64 array; convert to native complex once
+        return data.view(">c16").astype(complex)
 
     def _set_meas_trigger_ready_pxi_line(self, line_str: str):
         line = int(line_str[-1])
@@ -564,20 +643,54 @@ class PxiVna(VisaInstrument):
         self.trigger_manager.reserve(segment, line)
         self.write(f"CONT:SIGN:PXI:RTR:ROUT {line_str}")
 
+    def _enable_service_request(self) -> bool:
+        """Enable the service request event queue, or return False if the VISA
+        backend or resource does not support it.
+        """
+        try:
+            self.visa_handle.enable_event(SERVICE_REQUEST, constants.EventMechanism.queue)
+        except (errors.VisaIOError, NotImplementedError):
+            self.log.info("Service requests are not supported; run_sweep will poll.")
+            return False
+        return True
+
     def run_sweep(self):
         """Start a sweep and wait until it is finished.
         The output is turned on before the sweep and turned off after.
         """
         self.output(True)
         if self.average():
-            self.group_trigger_count(self.average_count())
-            self.sweep_mode("groups")
+            # one trigger group per average; set the count and start in one message
+            count = self.average_count()
+            sweep = f"SENS:SWE:GRO:COUN {count};:SENS:SWE:MODE GRO"
+            self.group_trigger_count.cache.set(count)
+            self.sweep_mode.cache.set("groups")
         else:
-            self.sweep_mode("single")
+            sweep = "SENS:SWE:MODE SING"
+            self.sweep_mode.cache.set("single")
+
+        if self._service_request_enabled is None:
+            self._service_request_enabled = self._enable_service_request()
 
-        # when the sweep is finished, sweep_mode should be "hold"
         try:
-            while self.sweep_mode() != "hold":
-                time.sleep(0.1)
+            if self._service_request_enabled:
+                visa_handle = self.visa_handle
+                # reading the event status register clears a leftover OPC bit without
+                # emptying the error queue like *CLS would
+                self.ask("*ESR?")
+                visa_handle.discard_events(SERVICE_REQUEST, constants.EventMechanism.queue)
+                self.write(f"{OPC_SERVICE_REQUEST};:{sweep};*OPC")
+                # wait in short intervals so that the wait can be interrupted
+                while visa_handle.wait_on_event(
+                    SERVICE_REQUEST, 1000, capture_timeout=True
+                ).timed_out:
+                    pass
+                visa_handle.read_stb()  # clear the service request
+                self.sweep_mode.cache.set("hold")  # the instrument returns to hold
+            else:
+                self.write(sweep)
+                # when the sweep is finished, sweep_mode should be "hold"
+                while self.sweep_mode() != "hold":
+                    time.sleep(0.1)
         finally:
             self.output(False)
@@ -0,0 +1,159 @@
+from typing import Any, Dict, Mapping, Optional, Sequence
+
+from qcodes import Parameter, VisaInstrument
+
+# The functions below are the only places that use qcodes internals without a public
+# equivalent (checked against qcodes 0.35 to 0.44: Command.cmd_str,
+# ParameterBase._snapshot_get, _from_value_to_raw_value, _from_raw_value_to_value,
+# and _Cache._update_with). Recheck them here when upgrading qcodes.
+
+
+def get_query(parameter: Parameter) -> Optional[str]:
+    """Returns the SCPI query of a parameter created with a get_cmd string, None otherwise."""
+    return getattr(parameter.get_raw, "cmd_str", None)
+
+
+def get_set_command(parameter: Parameter) -> Optional[str]:
+    """Returns the SCPI command of a parameter created with a set_cmd string, None otherwise."""
+    return getattr(parameter.set_raw, "cmd_str", None)
+
+
+def _is_updated_by_snapshot(parameter: Parameter) -> bool:
+    """Same condition as Instrument.snapshot_base and Parameter.snapshot_base use to
+    decide whether snapshot(update=True) gets the parameter.
+    """
+    return (
+        not parameter.snapshot_exclude
+        and parameter.snapshot_value
+        and getattr(parameter, "_snapshot_get", True)
+    )
+
+
+def _to_raw_value(parameter: Parameter, value: Any) -> Any:
+    return parameter._from_value_to_raw_value(value)
+
+
+def _from_raw_value(parameter: Parameter, raw_value: Any) -> Any:
+    return parameter._from_raw_value_to_value(raw_value)
+
+
+def _update_cache(parameter: Parameter, value: Any, raw_value: Any) -> None:
+    """Like parameter.cache.set(value) but without converting value to raw again."""
+    parameter.cache._update_with(value=value, raw_value=raw_value)
+
+
+def batch_set(instrument: VisaInstrument, values: Mapping[Parameter, Any]) -> None:
+    """Set parameters in one compound SCPI message followed by *OPC?, so that there is
+    one round trip in total instead of one per parameter.
+    The values are validated and mapped like in Parameter.set, and written into the
+    parameter caches once the instrument has completed the commands.
+    """
+    commands = []
+    raw_values = []
+    for parameter, value in values.items():
+        command = get_set_command(parameter)
+        if command is None:
+            raise ValueError(f"{parameter.name} does not have a set_cmd string.")
+        parameter.validate(value)
+        raw_value = _to_raw_value(parameter, value)
+        commands.append(command.format(raw_value).lstrip(":"))
+        raw_values.append(raw_value)
+    if len(commands) == 0:
+        return
+    instrument.ask(";:".join(commands) + ";*OPC?")
+    for (parameter, value), raw_value in zip(values.items(), raw_values):
+        _update_cache(parameter, value, raw_value)
+
+
+def batch_get(instrument: VisaInstrument, parameters: Sequence[Parameter]) -> list:
+    """Get parameters in one compound SCPI query instead of one round trip each.
+    The parsed values are written into the parameter caches and returned.
+    """
+    queries = [get_query(parameter) for parameter in parameters]
+    if None in queries:
+        raise ValueError("Only parameters with a get_cmd string can be batched.")
+    if len(queries) == 0:
+        return []
+    # ";:" resets the command tree so that every query is taken from the root
+    responses = instrument.ask(";:".join(q.lstrip(":") for q in queries)).split(";")
+    if len(responses) != len(queries):
+        raise RuntimeError(f"Expected {len(queries)} responses, got {len(responses)}.")
+    values = []
+    for parameter, raw_value in zip(parameters, responses):
+        value = _from_raw_value(parameter, raw_value)
+        _update_cache(parameter, value, raw_value)
+        values.append(value)
+    return values
+
+
+def batch_update(
+    instrument: VisaInstrument,
+    params_to_skip_update: Optional[Sequence[str]] = None,
+    unbatchable: Optional[set[str]] = None,
+) -> list[str]:
+    """Get the parameters that instrument.snapshot(update=True) would get, in one
+    compound query, except those in params_to_skip_update.
+    Parameters whose names are in unbatchable are left to qcodes. If the compound
+    query fails, each parameter is got on its own, and the names of those that fail
+    are added to unbatchable so that later snapshots do not wait for them again.
+    Returns params_to_skip_update extended with the names of the parameters that
+    have been got, so that snapshot_base can use the caches instead.
+    """
+    skip = list(params_to_skip_update or ())
+    if unbatchable is None:
+        unbatchable = set()
+    parameters = [
+        parameter
+        for name, parameter in instrument.parameters.items()
+        if name not in skip
+        and name not in unbatchable
+        and _is_updated_by_snapshot(parameter)
+        and get_query(parameter) is not None
+    ]
+    try:
+        batch_get(instrument, parameters)
+    except Exception:
+        instrument.log.warning(
+            "Batched snapshot update failed; getting the parameters one by one.",
+            exc_info=True,
+        )
+        for parameter in parameters:
+            try:
+                parameter.get()
+            except Exception:
+                instrument.log.warning(
+                    f"Leaving {parameter.name} out of batched snapshot updates.",
+                    exc_info=True,
+                )
+                unbatchable.add(parameter.name)
+    # failed ones are skipped too, so that this snapshot does not wait for them twice
+    return skip + [parameter.name for parameter in parameters]
+
+
+class ScpiBatchMixin:
+    """Adds configure() and batched snapshot updates to a VisaInstrument subclass.
+    Put it before VisaInstrument in the base classes.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        # names of parameters whose queries failed in a batched snapshot update
+        self._unbatchable_parameters: set[str] = set()
+        super().__init__(*args, **kwargs)
+
+    def configure(self, **values: Any) -> None:
+        """Set several parameters in one message, e.g. configure(frequency=5e9, power=0).
+        Only parameters with a set_cmd string are supported.
+        """
+        batch_set(self, {self.parameters[name]: value for name, value in values.items()})
+
+    def snapshot_base(
+        self,
+        update: Optional[bool] = False,
+        params_to_skip_update: Optional[Sequence[str]] = None,
+    ) -> Dict[Any, Any]:
+        if update:
+            # one compound query instead of one round trip per parameter
+            params_to_skip_update = batch_update(
+                self, params_to_skip_update, self._unbatchable_parameters
+            )
+        return super().snapshot_base(update, params_to_skip_update)